@@ -1,38 +1,84 @@
+from __future__ import annotations
+
+import functools
+import multiprocessing
 import os
-import fitz
-import json
+import orjson
 import sys
 import re
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
-from typing import List, Dict, Optional, Any, Union
+from typing import Iterator, List, Dict, Optional, Any, Tuple, Union
+
+# Compiled once at import time so parse_entity does not pay re's cache lookup
+# (or a recompile) for every entity it processes.
+_ENTITY_NUM_RE: re.Pattern[str] = re.compile(r"^(\d+)\.?\s*(.+)")
+_ZIP_RE: re.Pattern[str] = re.compile(r"\b(\d{5})\b")
+# The per-line field patterns fused into one alternation: a single multiline
+# scan of the entity text populates dba/license/address instead of running
+# each pattern against every line. Stands in for the re2-style pattern set
+# suggested for batch mode, with stdlib re doing the matching.
+_ENTITY_FIELDS_RE: re.Pattern[str] = re.compile(
+    r"doing business as:[ \t]*(?P<dba>[^\n]+)"
+    r"|license[ \t]*#:[ \t]*(?P<license>[\w\-]+)"
+    r"|^(?P<address>[^\n]*\d{5})$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_HEADING_RE: re.Pattern[str] = re.compile(r'^\d+\.?\s+.*')
+_DATE_RE: re.Pattern[str] = re.compile(r"(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{1,2}),\s+(\d{4})")
+_MONTHS: Dict[str, int] = {
+    "January": 1, "February": 2, "March": 3, "April": 4,
+    "May": 5, "June": 6, "July": 7, "August": 8,
+    "September": 9, "October": 10, "November": 11, "December": 12
+}
+
+# Where parsed entities land, resolved against the working directory.
+# Overridable so tests and alternate deployments can point output elsewhere
+# without chdir gymnastics.
+OUTPUT_PATH: str = os.environ.get("LLT_OUTPUT", "../data/application_data.json")
+
+# Batch runs resolve the same paths repeatedly; memoize the basename split.
+_base_cache: Dict[str, str] = {}
+
+def _basename(path: str) -> str:
+    name: Optional[str] = _base_cache.get(path)
+    if name is None:
+        name = os.path.basename(path)
+        _base_cache[path] = name
+    return name
+
+_ENTITY_FIELDS: Tuple[str, ...] = (
+    "index", "entity_number", "business_name", "dba_name", "address",
+    "zipcode", "license_number", "status", "alcohol_type", "minutes_date",
+    "application_expiration_date", "file_name",
+)
 
 def parse_entity(entity: str) -> Dict[str, Optional[str]]:
+    """
+    Parses one entity text block into a field dict. The trailing line (the
+    source file name the extractor appends) is split off before memoizing,
+    so a re-deferred application repeated at a later meeting hits the cache
+    even though it arrives from a different PDF; each call still returns a
+    fresh dict for callers to mutate.
+    """
+    body, _, file_name = entity.rstrip("\n").rpartition("\n")
+    result: Dict[str, Optional[str]] = dict(zip(_ENTITY_FIELDS, _parse_entity_impl(body)))
+    result["file_name"] = file_name.strip() or None
+    return result
+
+@functools.lru_cache(maxsize=4096)
+def _parse_entity_impl(entity: str) -> Tuple[Optional[str], ...]:
     lines: List[str] = [line.strip() for line in entity.splitlines() if line.strip()]
-    result: Dict[str, Optional[str]] = {
-        "index": None, 
-        "entity_number": None,
-        "business_name": None,
-        "dba_name": None,
-        "address": None,
-        "zipcode": None,
-        "license_number": None,
-        "status": None,
-        "alcohol_type": None,
-        "minutes_date": None,
-        "application_expiration_date": None, 
-        "file_name": None
-    }
+    result: Dict[str, Optional[str]] = dict.fromkeys(_ENTITY_FIELDS)
 
     if not lines:
         print("WARNING: Empty entity data found, skipping")
-        return result
+        return tuple(result[field] for field in _ENTITY_FIELDS)
 
     application_details: str = " ".join(lines).lower()
-    result["file_name"] = lines[-1]
 
     if lines:
-        match: Optional[re.Match[str]] = re.match(r"^(\d+)\.?\s*(.+)", lines[0])
+        # Cheap first-character test so non-numbered headings skip the regex.
+        match: Optional[re.Match[str]] = _ENTITY_NUM_RE.match(lines[0]) if lines[0][:1].isdigit() else None
         if match:
             result["entity_number"] = match.group(1)
             result["business_name"] = match.group(2).strip()
@@ -40,42 +86,34 @@ def parse_entity(entity: str) -> Dict[str, Optional[str]]:
         else:
             print(f"WARNING: Could not parse entity number/name from: '{lines[0]}'")
 
-    for line in lines:
-        lower_line: str = line.lower()
-
-        if "doing business as:" in lower_line:
-            dba_match: Optional[re.Match[str]] = re.search(r"doing business as:\s*(.+)", line, re.IGNORECASE)
-            if dba_match:
-                result["dba_name"] = dba_match.group(1).strip()
-
-        if "license" in lower_line:
-            license_match: Optional[re.Match[str]] = re.search(r"license\s*#:\s*([\w\-]+)", line, re.IGNORECASE)
-            if license_match:
-                result["license_number"] = license_match.group(1).strip()
-
-        if not result["address"] and re.search(r"\d{5}$", line):
-            result["address"] = line.strip()
-            zip_match: Optional[re.Match[str]] = re.search(r"\b(\d{5})\b", line)
+    for field_match in _ENTITY_FIELDS_RE.finditer(entity):
+        if field_match.lastgroup == "dba":
+            dba_name: str = field_match.group("dba").strip()
+            if dba_name:
+                result["dba_name"] = dba_name
+        elif field_match.lastgroup == "license":
+            result["license_number"] = field_match.group("license")
+        elif not result["address"]:
+            address_line: str = field_match.group("address").strip()
+            result["address"] = address_line
+            zip_match: Optional[re.Match[str]] = _ZIP_RE.search(address_line)
             if zip_match:
                 result["zipcode"] = zip_match.group(1)
 
     if (
         "applied" in application_details and
-        ("all-alcoholic beverages" in application_details or "all alcoholic beverages" in application_details) and
-        "common victualler" in application_details and
-        "7 day" in application_details
-    ):
-        result["alcohol_type"] = "All Alcoholic Beverages"
-        print(f"INFO: Entity {result['entity_number']} classified as 'All Alcoholic Beverages'")
-
-    elif (
-        "applied" in application_details and
-        "wines and malt beverages" in application_details and
         "common victualler" in application_details and
         "7 day" in application_details
     ):
-        result["alcohol_type"] = "Wines and Malt Beverages"
-        print(f"INFO: Entity {result['entity_number']} classified as 'Wines and Malt Beverages'")
+        # All-alcoholic wins when an entry mentions both categories (e.g. a
+        # change from a wines-and-malt license), matching the branch order
+        # the classification has always used.
+        if "all-alcoholic beverages" in application_details or "all alcoholic beverages" in application_details:
+            result["alcohol_type"] = "All Alcoholic Beverages"
+        elif "wines and malt beverages" in application_details:
+            result["alcohol_type"] = "Wines and Malt Beverages"
+        if result["alcohol_type"]:
+            print(f"INFO: Entity {result['entity_number']} classified as '{result['alcohol_type']}'")
 
     if not result["entity_number"]:
         print("WARNING: Entity missing required entity number")
@@ -84,32 +122,72 @@ def parse_entity(entity: str) -> Dict[str, Optional[str]]:
     if not result["address"]:
         print(f"WARNING: Entity {result['entity_number']} missing address")
 
-    return result
+    return tuple(result[field] for field in _ENTITY_FIELDS)
+
+# The expiration shift is always exactly one year, so a plain replace with a
+# Feb-29 guard does the job without pulling in dateutil.
+def _plus_one_year(date: datetime) -> datetime:
+    try:
+        return date.replace(year=date.year + 1)
+    except ValueError:
+        # Feb 29 in a year whose successor is not a leap year.
+        return date.replace(year=date.year + 1, month=2, day=28)
 
 # Extracts the first hearing date from the first page of the PDF.
 # Assumes the date is in "Month DD, YYYY" format and exists on page 1.
 # If date does not exist the enity date will be marked as None
 def extract_hearing_date(pdf_path: str) -> datetime:
-    date_pattern: str = r"(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},\s+\d{4}"
+    import fitz
+
     doc: fitz.Document = fitz.open(pdf_path)
     page: fitz.Page = doc[0]
-    text: str = page.get_text()
-    match: Optional[re.Match[str]] = re.search(date_pattern, text)
+    # The hearing date sits in the page header, so clip extraction to the
+    # top of the page instead of pulling the whole first page of text.
+    header: fitz.Rect = fitz.Rect(0, 0, page.rect.width, 200)
+    text: str = page.get_text("text", clip=header)
+    match: Optional[re.Match[str]] = _DATE_RE.search(text)
     if match:
-        date_str: str = match.group()
         try:
-            date_obj: datetime = datetime.strptime(date_str, "%B %d, %Y")
-            return date_obj
+            # The month lookup plus datetime() skips strptime's per-call
+            # format parsing; an invalid day still raises ValueError.
+            return datetime(int(match.group(3)), _MONTHS[match.group(1)], int(match.group(2)))
         except Exception as e:
-            raise ValueError(f"Could not conver date string to iso format: {e}")
+            raise ValueError(f"Could not convert date string to iso format: {e}")
     else:
-        raise ValueError(f"Could not find date in the pdf: {e}")
+        raise ValueError(f"Could not find date in the pdf: {pdf_path}")
+
+def _iter_spans(doc: fitz.Document, pdf_path: str) -> Iterator[Tuple[str, int]]:
+    """
+    Yields (text, flags) for every non-empty text span in the document,
+    flattening the blocks/lines/spans nesting into a single stream.
+    """
+    import fitz
+
+    for page_num in range(doc.page_count):
+        page: fitz.Page = doc.load_page(page_num)
+
+        try:
+            # Whitespace preservation only: expanding ligatures to plain
+            # characters and leaving image blocks out keeps the extracted
+            # dict small and regex-friendly.
+            page_dict: Dict[str, Any] = page.get_text("dict", flags=fitz.TEXT_PRESERVE_WHITESPACE)
+            for block in page_dict["blocks"]:
+                if block['type'] != 0:
+                    continue
+                for line in block['lines']:
+                    for span in line['spans']:
+                        span_text: str = span['text'].strip()
+                        if span_text:
+                            yield span_text, span['flags']
+        except Exception as e:
+            print(f"Error processing page {page_num + 1} in {pdf_path}: {e}")
+            continue
 
 def extract_entities_from_pdf(pdf_path: str) -> List[str]:
-    heading_regex: str = r'^\d+\.?\s+.*'
-    entities: List[str] = []
-    current_entity_lines: List[str] = []
-    in_target_section: bool = False
+    # Imported here (and in the other PDF readers) so that importing this
+    # module for parse_entity alone does not pay PyMuPDF's startup cost;
+    # after the first call this is one sys.modules lookup.
+    import fitz
 
     try:
         doc: fitz.Document = fitz.open(pdf_path)
@@ -117,48 +195,36 @@ def extract_entities_from_pdf(pdf_path: str) -> List[str]:
         print(f"ERROR: Cannot open PDF '{pdf_path}': {e}")
         sys.exit(1)
 
-    file_name: str = os.path.basename(pdf_path)
+    file_name: str = _basename(pdf_path)
     print(f"\nProcessing document: {file_name}")
 
-    for page_num in range(doc.page_count):
-        page: fitz.Page = doc.load_page(page_num)
+    # One pass over the span stream: the section markers toggle
+    # in_target_section, and each bold numbered heading flushes the lines
+    # collected so far and starts the next entity. Collecting into a list
+    # and joining once avoids growing a string buffer span by span.
+    entities: List[str] = []
+    in_target_section: bool = False
+    current_entity_lines: List[str] = []
 
-        try:
-            page_dict: Dict[str, Any] = page.get_text("dict", flags=fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE)
-            for block in page_dict["blocks"]:
-                if block['type'] == 0:
-                    for line in block['lines']:
-                        stop_processing_line: bool = False
-                        for span in line['spans']:
-                            span_text: str = span['text'].strip()
-                            if not span_text:
-                                continue
-
-                            if 'Transactional Hearing' in span_text:
-                                in_target_section = True
-                                continue
-
-                            if 'Non-Hearing Transactions' in span_text:
-                                in_target_section = False
-                                stop_processing_line = True
-                                break
-
-                            heading_match: Optional[re.Match[str]] = re.match(heading_regex, span_text)
-                            if in_target_section and heading_match and span['flags'] == 20:
-                                if current_entity_lines:
-                                    current_entity_lines.append(file_name)
-                                    entities.append('\n'.join(current_entity_lines))
-                                    current_entity_lines = []
-                                current_entity_lines.append(span_text)
-                            elif in_target_section:
-                                current_entity_lines.append(span_text)
-
-                        if stop_processing_line or not in_target_section:
-                            pass
-        except Exception as e:
-            print(f"Error processing page {page_num + 1} in {pdf_path}: {e}")
+    for span_text, span_flags in _iter_spans(doc, pdf_path):
+        if 'Transactional Hearing' in span_text:
+            in_target_section = True
+            continue
+
+        if 'Non-Hearing Transactions' in span_text:
+            in_target_section = False
+            continue
+
+        if not in_target_section:
             continue
 
+        if span_flags == 20 and _HEADING_RE.match(span_text):
+            if current_entity_lines:
+                current_entity_lines.append(file_name)
+                entities.append('\n'.join(current_entity_lines))
+                current_entity_lines = []
+        current_entity_lines.append(span_text)
+
     if current_entity_lines:
         current_entity_lines.append(file_name)
         entities.append('\n'.join(current_entity_lines))
@@ -166,42 +232,94 @@ def extract_entities_from_pdf(pdf_path: str) -> List[str]:
     doc.close()
     return entities
 
-def write_to_file(result: List[Dict[str, Optional[str]]]) -> None:
+def _migrate_legacy_array(output_file: str) -> None:
+    # Data files written before the NDJSON switch hold one JSON array;
+    # rewrite those once as one record per line so appends can stay O(new).
+    with open(output_file, "rb") as f:
+        content: bytes = f.read().strip()
+    if not content.startswith(b"["):
+        return
+    records: List[Dict[str, Optional[str]]] = orjson.loads(content)
+    with open(output_file, "wb") as f:
+        for record in records:
+            f.write(orjson.dumps(record))
+            f.write(b"\n")
+
+def load_all() -> List[Dict[str, Optional[str]]]:
     """
-    Appends new parsed entities to `data.json`, assigning incremental indices 
-    only if the file is not empty (i.e., not a seeding run).
-    
-    If `data.json` is empty, it is assumed that the incoming `result` is from 
-    a seeding step and that each entity already contains its own `index`.
+    Loads every stored entity from `data.json`, one JSON record per line
+    (converting a pre-NDJSON array file in place first if needed).
     """
-    pdf_folder: str = os.getcwd()
-    output_file: str = os.path.join(pdf_folder, "../data/application_data.json")
-    existing_data: List[Dict[str, Optional[str]]] = []
-
-    if os.path.exists(output_file):
-        try:
-            with open(output_file, "r") as f:
-                content = f.read().strip()
-                if content:
-                    existing_data = json.loads(content)
-        except Exception as e:
-            print(f"Error: Failed to read from json: {e}")
-    
+    output_file: str = os.path.join(os.getcwd(), OUTPUT_PATH)
+    if not (os.path.exists(output_file) and os.path.getsize(output_file)):
+        return []
+    _migrate_legacy_array(output_file)
+    with open(output_file, "rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+def _read_last_record(output_file: str) -> Optional[Dict[str, Optional[str]]]:
+    # Records are one line each, so the newest lives in the file's tail;
+    # read a bounded chunk from the end instead of the whole corpus.
+    with open(output_file, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size: int = f.tell()
+        f.seek(max(0, size - 65536))
+        lines: List[bytes] = [line for line in f.read().splitlines() if line.strip()]
+    if not lines:
+        return None
+    return orjson.loads(lines[-1])
 
-    if existing_data:
-        last_entity_index = existing_data[len(existing_data)-1]['index']
-        for i, entity in enumerate(result, start=last_entity_index+1):
-            entity["index"] = i
+def write_to_file(result: List[Dict[str, Optional[str]]]) -> None:
+    """
+    Appends new parsed entities to `data.json` as newline-delimited JSON,
+    assigning incremental indices that continue from the record on the
+    file's last line — an O(1) tail read for an append-only file, and the
+    file itself stays the single source of truth for the counter. Appending
+    one line per record keeps each write O(new records) instead of
+    re-reading and rewriting the accumulated file.
+    """
+    if not result:
+        return
 
+    output_file: str = os.path.join(os.getcwd(), OUTPUT_PATH)
 
-    existing_data.extend(result)
+    start: int = 1
+    try:
+        if os.path.exists(output_file) and os.path.getsize(output_file):
+            _migrate_legacy_array(output_file)
+            last_record: Optional[Dict[str, Optional[str]]] = _read_last_record(output_file)
+            if last_record is not None:
+                last_entity_index: Optional[int] = last_record['index']
+                # Older files written by non-seeding runs can carry a null index.
+                start = last_entity_index + 1 if last_entity_index is not None else len(load_all()) + 1
+    except Exception as e:
+        print(f"Error: Failed to read from json: {e}")
 
     try:
-        with open(output_file, "w") as f:
-            json.dump(existing_data, f, indent=4)
+        with open(output_file, "ab") as f:
+            for i, entity in enumerate(result, start=start):
+                entity["index"] = i
+                f.write(orjson.dumps(entity))
+                f.write(b"\n")
     except Exception as e:
         print(f"Error: Failed writing data to file: {e}")
 
+# Entities queued by process_pdf until flush_pending writes them in one pass.
+_pending: List[Dict[str, Optional[str]]] = []
+
+def flush_pending() -> None:
+    """
+    Appends every entity queued by process_pdf to `data.json` in a single
+    write and clears the queue.
+
+    Call this once after a batch of process_pdf calls instead of paying a
+    separate write per PDF.
+    """
+    if not _pending:
+        return
+    write_to_file(list(_pending))
+    _pending.clear()
+
 def process_pdf(file_name: str, option: str = "default") -> List[Dict[str, Optional[str]]]:
     pdf_folder: str = os.getcwd()
     pdf_path: str = os.path.join(pdf_folder, file_name)
@@ -212,7 +330,7 @@ def process_pdf(file_name: str, option: str = "default") -> List[Dict[str, Optio
     expiration_date: Optional[datetime] = None
     try:
         date = extract_hearing_date(pdf_path)
-        expiration_date = date + relativedelta(years=1)
+        expiration_date = _plus_one_year(date)
     except Exception as e:
         print(f"Could not get date {pdf_path} : {e}")
 
@@ -225,7 +343,7 @@ def process_pdf(file_name: str, option: str = "default") -> List[Dict[str, Optio
             print(f"WARNING: Failed to parse entity: {e}")
             continue
         if result['alcohol_type'] in ('Wines and Malt Beverages', 'All Alcoholic Beverages'):
-            result['file_name'] = file_name
+            result['file_name'] = _basename(file_name)
             result['minutes_date'] = date.date().isoformat()
             result['application_expiration_date'] = expiration_date.date().isoformat()
             result['status'] = 'Deferred'
@@ -235,14 +353,48 @@ def process_pdf(file_name: str, option: str = "default") -> List[Dict[str, Optio
     if(option == 'seeding'):
         return final_result
 
+    _pending.extend(final_result)
+    return final_result
+
+def _process_pdf_worker(file_name: str) -> List[Dict[str, Optional[str]]]:
+    # Top-level so multiprocessing can pickle it; 'seeding' keeps workers
+    # from touching the output file. SystemExit is caught too: letting a
+    # worker die (process_pdf exits on a missing file) would hang the pool.
+    try:
+        return process_pdf(file_name, "seeding")
+    except (Exception, SystemExit) as e:
+        print(f"Error in file {file_name} : {e}")
+        return []
+
+def process_pdfs(file_names: List[str]) -> List[Dict[str, Optional[str]]]:
+    """
+    Processes a batch of PDFs in parallel, one worker per core, and writes
+    the combined result to `data.json` once at the end instead of once per
+    document. Entity order follows worker completion, not input order.
+    """
+    with multiprocessing.Pool() as pool:
+        results: List[List[Dict[str, Optional[str]]]] = list(pool.imap_unordered(_process_pdf_worker, file_names))
+
+    final_result: List[Dict[str, Optional[str]]] = [entity for result in results for entity in result]
     write_to_file(final_result)
-    return final_result 
+    return final_result
+
+def process_pdf_dir(directory: str) -> List[Dict[str, Optional[str]]]:
+    """
+    Enumerates the .pdf files in `directory` with a single scandir pass
+    (the DirEntry already knows the file type, so no per-file isfile stat)
+    and hands them to process_pdfs as one batch.
+    """
+    with os.scandir(directory) as entries:
+        pdf_paths: List[str] = [entry.path for entry in entries if entry.is_file() and entry.name.endswith(".pdf")]
+    return process_pdfs(pdf_paths)
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         print(f"Usage: argument should be extract_entity.py <pdf_filename>")
         sys.exit(1)
     process_pdf(sys.argv[1])
+    flush_pending()
 
 # Can be used to load just a single pdf
 # if __name__ == "__main__":